@@ -0,0 +1,224 @@
+import unittest
+import numpy as np
+import scipy.sparse as SP
+import libpysal
+from spreg import user_output as USER
+
+
+class TestConstantColumns(unittest.TestCase):
+    def setUp(self):
+        # full non-constant, full constant, implicit zeros non-constant,
+        # implicit zeros with stored zero (constant), empty, implicit zeros
+        # next to a non-zero value
+        self.x = np.array(
+            [
+                [1.0, 2.0, 0.0, 0.0, 0.0, 0.0],
+                [3.0, 2.0, 4.0, 0.0, 0.0, 5.0],
+                [5.0, 2.0, 0.0, 0.0, 0.0, 5.0],
+                [7.0, 2.0, 6.0, 0.0, 0.0, 0.0],
+            ]
+        )
+        self.expected = np.ptp(self.x, 0) == 0
+
+    def check(self, x):
+        np.testing.assert_array_equal(
+            USER._constant_columns(x), np.ptp(x.toarray(), 0) == 0
+        )
+
+    def test_dense(self):
+        np.testing.assert_array_equal(USER._constant_columns(self.x), self.expected)
+
+    def test_dense_blocks(self):
+        # constant and non-constant columns spanning several row blocks,
+        # with the only variation in the last row
+        n = 2 * USER._BLOCK_ROWS + 3
+        x = np.ones((n, 3))
+        x[:, 1] = np.arange(n)
+        x[-1, 2] = 2.0
+        np.testing.assert_array_equal(
+            USER._constant_columns(x), np.array([True, False, False])
+        )
+
+    def test_sparse_formats(self):
+        for fmt in (SP.csr_matrix, SP.csc_matrix, SP.coo_matrix):
+            self.check(fmt(self.x))
+
+    def test_explicit_zeros(self):
+        r, c = np.nonzero(self.x)
+        v = self.x[r, c]
+        # stored zeros in the empty column and in a column with implicit zeros
+        x = SP.csc_matrix(
+            (np.r_[v, 0.0, 0.0], (np.r_[r, 0, 2], np.r_[c, 4, 2])), shape=self.x.shape
+        )
+        self.assertEqual(x.nnz, v.size + 2)
+        self.check(x)
+
+    def test_duplicates(self):
+        # every stored entry of a CSC matrix split into two halves
+        base = SP.csc_matrix(self.x)
+        nnz = np.diff(base.indptr)
+        indptr = np.r_[0, np.cumsum(2 * nnz)]
+        indices = np.concatenate(
+            [np.tile(base.indices[i:j], 2) for i, j in zip(base.indptr, base.indptr[1:])]
+        )
+        data = np.concatenate(
+            [np.tile(base.data[i:j] / 2, 2) for i, j in zip(base.indptr, base.indptr[1:])]
+        )
+        x = SP.csc_matrix((data, indices, indptr), shape=self.x.shape)
+        self.assertFalse(x.has_canonical_format)
+        self.check(x)
+
+    def test_random(self):
+        rng = np.random.default_rng(8879)
+        for _ in range(50):
+            x = rng.choice([0.0, 0.0, 1.0, -2.0], size=(6, 5))
+            x[:, 0] = x[0, 0]
+            self.check(SP.csr_matrix(x))
+
+
+class TestCheckConstant(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(8879)
+        self.x = rng.integers(0, 10, size=(8, 4)).astype(float)
+        self.x[:, 0] += np.arange(8)
+        self.x[:, 1] = 3.0
+        self.x[:, 3] = 0.0
+        self.x[0, 2] = 11.0
+        self.names = ["a", "b", "c", "d"]
+
+    def inputs(self):
+        return ((self.x, np.asarray), (SP.csr_matrix(self.x), lambda m: m.toarray()))
+
+    def test_add_ones(self):
+        for x, dense in self.inputs():
+            x_constant, name_x, warn = USER.check_constant(x, self.names)
+            np.testing.assert_array_equal(
+                dense(x_constant), np.column_stack((np.ones(8), self.x[:, [0, 2]]))
+            )
+            self.assertEqual(name_x, ["a", "c"])
+            self.assertEqual(warn, "Variable(s) ['b', 'd'] removed for being constant.")
+        self.assertEqual(self.names, ["a", "b", "c", "d"])
+
+    def test_just_rem(self):
+        for x, dense in self.inputs():
+            x_constant, name_x, warn = USER.check_constant(x, self.names, just_rem=True)
+            np.testing.assert_array_equal(dense(x_constant), self.x[:, [0, 2]])
+            self.assertEqual(name_x, ["a", "c"])
+            self.assertEqual(warn, "Variable(s) ['b', 'd'] removed for being constant.")
+
+    def test_no_names(self):
+        for just_rem in (False, True):
+            for x, dense in self.inputs():
+                x_constant, name_x, warn = USER.check_constant(x, just_rem=just_rem)
+                self.assertEqual(dense(x_constant).shape, (8, 3 - just_rem))
+                self.assertIsNone(name_x)
+                self.assertEqual(
+                    warn, "2 variables have been removed for being constant."
+                )
+                x_constant, name_x, warn = USER.check_constant(
+                    x[:, :3], just_rem=just_rem
+                )
+                self.assertEqual(
+                    warn, "One variable has been removed for being constant."
+                )
+
+    def test_no_constant(self):
+        for x, dense in self.inputs():
+            x_constant, name_x, warn = USER.check_constant(x[:, [0, 2]], ["a", "c"])
+            np.testing.assert_array_equal(
+                dense(x_constant), np.column_stack((np.ones(8), self.x[:, [0, 2]]))
+            )
+            self.assertEqual(name_x, ["a", "c"])
+            self.assertIsNone(warn)
+
+    def test_dtype(self):
+        x = self.x.astype(int)
+        x_constant, name_x, warn = USER.check_constant(x)
+        self.assertEqual(x_constant.dtype, np.float64)
+        np.testing.assert_array_equal(x_constant[:, 0], np.ones(8))
+        x_constant, name_x, warn = USER.check_constant(SP.csr_matrix(x))
+        self.assertEqual(x_constant.dtype, np.float64)
+        x_constant, name_x, warn = USER.check_constant(self.x)
+        self.assertEqual(x_constant.dtype, np.float64)
+
+
+class TestCheckArrays(unittest.TestCase):
+    def setUp(self):
+        self.x = np.random.default_rng(8879).normal(size=(10, 2))
+
+    def test_csr_matrix(self):
+        self.assertEqual(USER.check_arrays(self.x, SP.csr_matrix(self.x)), 10)
+
+    def test_other_sparse_formats_rejected(self):
+        for fmt in (SP.csc_matrix, SP.coo_matrix, SP.lil_matrix):
+            with self.assertRaisesRegex(Exception, "sparse csr matrices"):
+                USER.check_arrays(self.x, fmt(self.x))
+
+    def test_mismatched_lengths(self):
+        with self.assertRaisesRegex(Exception, "same length"):
+            USER.check_arrays(self.x, self.x[:5])
+
+    def test_all_none(self):
+        self.assertRaises(Exception, USER.check_arrays, None, None)
+
+    def test_sparse_array_rejected(self):
+        with self.assertRaisesRegex(Exception, "sparse csr matrices"):
+            USER.check_arrays(self.x, SP.csr_array(self.x))
+
+
+class TestCheckWeights(unittest.TestCase):
+    def setUp(self):
+        self.w = libpysal.weights.lat2W(3, 3)
+        self.y = np.ones((9, 1))
+
+    def test_valid(self):
+        USER.check_weights(self.w, self.y)
+        USER.check_weights(None, self.y)
+
+    def test_missing(self):
+        self.assertRaises(Exception, USER.check_weights, None, self.y, True)
+
+    def test_diagonal_edited_in_place(self):
+        USER.check_weights(self.w, self.y)
+        self.w.sparse.setdiag(1.0)
+        self.assertRaises(Exception, USER.check_weights, self.w, self.y)
+
+
+class TestCheckRobust(unittest.TestCase):
+    def setUp(self):
+        self.points = np.random.default_rng(8879).random((30, 2))
+
+    def kernel(self, off_diag=None):
+        wk = libpysal.weights.Kernel(self.points, k=4, fixed=False, diagonal=True)
+        if off_diag is not None:
+            i = wk.id_order[3]
+            j = [k for k, nb in enumerate(wk.neighbors[i]) if nb != i][0]
+            wk.weights[i][j] = off_diag
+            wk._reset()
+        return wk
+
+    def test_hac_valid(self):
+        USER.check_robust("hac", self.kernel())
+        USER.check_robust("hac", self.kernel(0.5))
+
+    def test_hac_off_diagonal_negative(self):
+        with self.assertRaisesRegex(Exception, "greater than or equal to 0"):
+            USER.check_robust("hac", self.kernel(-0.5))
+
+    def test_hac_off_diagonal_above_one(self):
+        with self.assertRaisesRegex(Exception, "less than 1"):
+            USER.check_robust("hac", self.kernel(1.5))
+
+    def test_hac_diagonal(self):
+        wk = self.kernel()
+        wk.transform = "r"
+        with self.assertRaisesRegex(Exception, "diagonal"):
+            USER.check_robust("hac", wk)
+
+    def test_white(self):
+        USER.check_robust("White", None)
+        self.assertRaises(Exception, USER.check_robust, "white", self.kernel())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,11 +7,16 @@ __author__ = (
     "Jing Yao jingyao@asu.edu"
 )
 import numpy as np
-import copy as COPY
+import warnings
+from functools import lru_cache
+from itertools import compress
 from . import diagnostics
 from . import sputils as spu
 from libpysal import weights
-from scipy.sparse.csr import csr_matrix
+from scipy.sparse import csr_matrix, issparse
+
+# rows compared at a time when looking for constant dense columns
+_BLOCK_ROWS = 4096
 
 
 def set_name_ds(name_ds):
@@ -54,6 +59,24 @@ def set_name_y(name_y):
     return name_y
 
 
+@lru_cache(maxsize=256)
+def _var_names(k):
+    """Generic names for k exogenous variables, cached on k."""
+    return tuple(f"var_{i + 1}" for i in range(k))
+
+
+@lru_cache(maxsize=256)
+def _endog_names(k):
+    """Generic names for k endogenous variables, cached on k."""
+    return tuple(f"endogenous_{i + 1}" for i in range(k))
+
+
+@lru_cache(maxsize=256)
+def _instrument_names(k):
+    """Generic names for k external instruments, cached on k."""
+    return tuple(f"instrument_{i + 1}" for i in range(k))
+
+
 def set_name_x(name_x, x, constant=False):
     """Set the independent variable names in regression; return generic name if user
     provides no explicit name."
@@ -75,12 +98,10 @@ def set_name_x(name_x, x, constant=False):
 
     """
     if not name_x:
-        name_x = ["var_" + str(i + 1) for i in range(x.shape[1] - 1 + int(constant))]
-    else:
-        name_x = name_x[:]
+        name_x = _var_names(x.shape[1] - 1 + int(constant))
     if not constant:
-        name_x.insert(0, "CONSTANT")
-    return name_x
+        return ["CONSTANT", *name_x]
+    return list(name_x)
 
 
 def set_name_yend(name_yend, yend):
@@ -99,7 +120,7 @@ def set_name_yend(name_yend, yend):
     """
     if yend is not None:
         if not name_yend:
-            return ["endogenous_" + str(i + 1) for i in range(len(yend[0]))]
+            return list(_endog_names(len(yend[0])))
         else:
             return name_yend[:]
     else:
@@ -124,7 +145,7 @@ def set_name_q(name_q, q):
     """
     if q is not None:
         if not name_q:
-            return ["instrument_" + str(i + 1) for i in range(len(q[0]))]
+            return list(_instrument_names(len(q[0])))
         else:
             return name_q[:]
     else:
@@ -170,13 +191,9 @@ def set_name_q_sp(name_x, w_lags, name_q, lag_q, force_all=False):
         names = name_x[1:]  # drop the constant
     if lag_q:
         names = names + name_q
-    sp_inst_names = []
-    for j in names:
-        sp_inst_names.append("W_" + j)
-    if w_lags > 1:
-        for i in range(2, w_lags + 1):
-            for j in names:
-                sp_inst_names.append("W" + str(i) + "_" + j)
+    sp_inst_names = [f"W_{j}" for j in names] + [
+        f"W{i}_{j}" for i in range(2, w_lags + 1) for j in names
+    ]
     return sp_inst_names
 
 
@@ -236,8 +253,8 @@ def set_name_w(name_w, w):
     name_w      : string
 
     """
-    if w != None:
-        if name_w != None:
+    if w is not None:
+        if name_w is not None:
             return name_w
         else:
             return "unknown"
@@ -275,29 +292,31 @@ def set_name_multi(
     name_y = set_name_y(name_y)
     name_x = set_name_x(name_x, x)
     name_multiID = set_name_ds(name_multiID)
-    if endog or sp_lag:
+    has_endog = bool(endog or sp_lag)
+    if has_endog:
         name_yend = set_name_yend(endog[2], endog[0])
         name_q = set_name_q(endog[3], endog[1])
+    robust = set_robust(robust)
     for r in multi_set:
-        multireg[r].title = title + "%s" % r
-        multireg[r].name_ds = name_ds
-        multireg[r].robust = set_robust(robust)
-        multireg[r].name_w = name_w
-        multireg[r].name_y = "%s_%s" % (str(r), name_y)
-        multireg[r].name_x = ["%s_%s" % (str(r), i) for i in name_x]
-        multireg[r].name_multiID = name_multiID
-        if endog or sp_lag:
-            multireg[r].name_yend = ["%s_%s" % (str(r), i) for i in name_yend]
-            multireg[r].name_q = ["%s_%s" % (str(r), i) for i in name_q]
+        pref = f"{r}_"
+        obj = multireg[r]
+        obj.title = f"{title}{r}"
+        obj.name_ds = name_ds
+        obj.robust = robust
+        obj.name_w = name_w
+        obj.name_y = f"{pref}{name_y}"
+        obj.name_x = [f"{pref}{i}" for i in name_x]
+        obj.name_multiID = name_multiID
+        if has_endog:
+            obj.name_yend = [f"{pref}{i}" for i in name_yend]
+            obj.name_q = [f"{pref}{i}" for i in name_q]
             if sp_lag:
-                multireg[r].name_yend.append(set_name_yend_sp(multireg[r].name_y))
-                multireg[r].name_q.extend(
-                    set_name_q_sp(
-                        multireg[r].name_x, sp_lag[0], multireg[r].name_q, sp_lag[1]
-                    )
+                obj.name_yend.append(set_name_yend_sp(obj.name_y))
+                obj.name_q.extend(
+                    set_name_q_sp(obj.name_x, sp_lag[0], obj.name_q, sp_lag[1])
                 )
-            multireg[r].name_z = multireg[r].name_x + multireg[r].name_yend
-            multireg[r].name_h = multireg[r].name_x + multireg[r].name_q
+            obj.name_z = obj.name_x + obj.name_yend
+            obj.name_h = obj.name_x + obj.name_q
     return multireg
 
 
@@ -337,7 +356,7 @@ def check_arrays(*arrays):
     49
 
     """
-    rows = []
+    first_n = -1
     for i in arrays:
         if i is None:
             continue
@@ -348,16 +367,18 @@ def check_arrays(*arrays):
         shape = i.shape
         if len(shape) > 2:
             raise Exception("all input arrays must have two dimensions")
-        if len(shape) == 1:
-            shape = (shape[0], 1)
-        if shape[0] < shape[1]:
+        n, k = (shape[0], 1) if len(shape) == 1 else shape
+        if n < k:
             raise Exception("one or more input arrays have more columns than rows")
+        if first_n < 0:
+            first_n = n
+        elif n != first_n:
+            raise Exception("arrays not all of same length")
         if not spu.spisfinite(i):
             raise Exception("one or more input arrays have missing/NaN values")
-        rows.append(shape[0])
-    if len(set(rows)) > 1:
-        raise Exception("arrays not all of same length")
-    return rows[0]
+    if first_n < 0:
+        raise Exception("at least one input array must be provided")
+    return first_n
 
 
 def check_y(y, n):
@@ -401,12 +422,14 @@ def check_y(y, n):
         print(y.__class__.__name__)
         raise Exception("y must be a numpy array")
     shape = y.shape
+    if shape == (n, 1):
+        return y
     if len(shape) > 2:
         raise Exception("all input arrays must have two dimensions")
     if len(shape) == 1:
         try:
             y = y.reshape(n, 1)
-        except:
+        except ValueError:
             raise Exception(
                 "y must be a single column array matching the length of other arrays"
             )
@@ -460,20 +483,16 @@ def check_weights(w, y, w_required=False, time=False):
     # should not raise an exception
 
     """
-    if w_required == True or w != None:
-        if w == None:
+    if w_required == True or w is not None:
+        if w is None:
             raise Exception("A weights matrix w must be provided to run this method.")
         if not isinstance(w, weights.W):
-            from warnings import warn
-
-            warn("w must be API-compatible pysal weights object")
+            warnings.warn("w must be API-compatible pysal weights object")
         if w.n != y.shape[0] and time == False:
             raise Exception("y must have n rows, and w must be an nxn PySAL W object")
         diag = w.sparse.diagonal()
         # check to make sure all entries equal 0
-        if diag.min() != 0:
-            raise Exception("All entries on diagonal must equal 0.")
-        if diag.max() != 0:
+        if diag.any():
             raise Exception("All entries on diagonal must equal 0.")
 
 
@@ -518,29 +537,23 @@ def check_robust(robust, wk):
         if robust.lower() == "hac":
             if not isinstance(wk, weights.Kernel):
                 raise Exception("HAC requires that wk be a Kernel Weights object")
-            diag = wk.sparse.diagonal()
+            S = wk.sparse
+            diag = S.diagonal()
             # check to make sure all entries equal 1
-            if diag.min() < 1.0:
-                print(diag.min())
-                raise Exception(
-                    "All entries on diagonal of kernel weights matrix must equal 1."
-                )
-            if diag.max() > 1.0:
-                print(diag.max())
+            if not np.all(diag == 1.0):
                 raise Exception(
                     "All entries on diagonal of kernel weights matrix must equal 1."
                 )
             # ensure off-diagonal entries are in the set of real numbers [0,1)
-            wegt = wk.weights
-            for i in wk.id_order:
-                vals = wegt[i]
-                vmin = min(vals)
-                vmax = max(vals)
-                if vmin < 0.0:
+            S = S.tocsr()
+            rows = np.repeat(np.arange(S.shape[0]), np.diff(S.indptr))
+            off = S.data[S.indices != rows]
+            if off.size:
+                if off.min() < 0.0:
                     raise Exception(
                         "Off-diagonal entries must be greater than or equal to 0."
                     )
-                if vmax > 1.0:
+                if off.max() > 1.0:
                     # NOTE: we are not checking for the case of exactly 1.0 ###
                     raise Exception("Off-diagonal entries must be less than 1.")
         elif robust.lower() == "white" or robust.lower() == "ogmm":
@@ -617,6 +630,54 @@ def check_regimes(reg_set, N=None, K=None):
         )
 
 
+def _constant_columns(x):
+    """Flag the columns of x that hold a single value.
+
+    Every column is compared against its first row in blocks of
+    _BLOCK_ROWS rows, so the boolean temporary stays bounded regardless of
+    n, and the scan stops as soon as no column can still be constant. For
+    sparse matrices the column minima and maxima are taken with reduceat
+    over the stored CSC values of the non-empty columns, folding in zero
+    for columns that also have implicit zeros.
+
+    Parameters
+    ----------
+    x           : array or sparse matrix
+                  nxk matrix of independent variables
+
+    Returns
+    -------
+    mask        : array
+                  Boolean array of length k, True for constant columns
+
+    """
+    if not issparse(x):
+        first = x[0]
+        mask = np.ones(x.shape[1:], dtype=bool)
+        for start in range(1, x.shape[0], _BLOCK_ROWS):
+            mask &= (x[start : start + _BLOCK_ROWS] == first).all(axis=0)
+            if not mask.any():
+                break
+        return mask
+    x = x.tocsc()
+    if not x.has_canonical_format:
+        x = x.copy()
+        x.sum_duplicates()
+    n, k = x.shape
+    nnz = np.diff(x.indptr)
+    # empty columns are all zeros
+    mask = np.ones(k, dtype=bool)
+    nonempty = nnz > 0
+    starts = x.indptr[:-1][nonempty]
+    mn = np.minimum.reduceat(x.data, starts)
+    mx = np.maximum.reduceat(x.data, starts)
+    implicit = nnz[nonempty] < n
+    mn[implicit] = np.minimum(mn[implicit], 0)
+    mx[implicit] = np.maximum(mx[implicit], 0)
+    mask[nonempty] = mn == mx
+    return mask
+
+
 def check_constant(x, name_x=None, just_rem=False):
     """Check if the X matrix contains a constant. If it does, drop the constant and replace by a vector of ones.
 
@@ -650,33 +711,44 @@ def check_constant(x, name_x=None, just_rem=False):
     (49, 3)
 
     """
-    x_constant = COPY.copy(x)
-    keep_x = COPY.copy(name_x)
+    x_constant = x
+    keep_x = list(name_x) if name_x is not None else None
     warn = None
-    if isinstance(x_constant, np.ndarray):
-        diffs = np.ptp(x_constant, axis=0)
-        if sum(diffs == 0) > 0:
-            x_constant = np.delete(x_constant, np.nonzero(diffs == 0), 1)
-    else:
-        diffs = (x_constant.max(axis=0).toarray() - x_constant.min(axis=0).toarray())[0]
-        if sum(diffs == 0) > 0:
-            x_constant = x_constant[:, np.nonzero(diffs > 0)[0]]
-
-    if sum(diffs == 0) > 0:
+    is_sparse = issparse(x)
+    n = x.shape[0]
+    zero_mask = _constant_columns(x)
+    n_const = int(zero_mask.sum())
+
+    if n_const > 0:
+        keep_mask = ~zero_mask
+        if is_sparse:
+            x_constant = x[:, np.flatnonzero(keep_mask)]
+        else:
+            x_constant = np.delete(x, np.flatnonzero(zero_mask), 1)
         if keep_x:
-            rem_x = [keep_x[i] for i in np.nonzero(diffs == 0)[0]]
+            rem_x = list(compress(keep_x, zero_mask))
             warn = "Variable(s) " + str(rem_x) + " removed for being constant."
-            keep_x[:] = [keep_x[i] for i in np.nonzero(diffs > 0)[0]]
+            keep_x[:] = compress(keep_x, keep_mask)
         else:
-            if sum(diffs == 0) == 1:
+            if n_const == 1:
                 warn = "One variable has been removed for being constant."
             else:
                 warn = (
-                    str(sum(diffs == 0))
+                    str(n_const)
                     + " variables have been removed for being constant."
                 )
     if not just_rem:
-        return spu.sphstack(np.ones((x_constant.shape[0], 1)), x_constant), keep_x, warn
+        if is_sparse:
+            ones = np.empty((n, 1))
+            ones.fill(1.0)
+            return spu.sphstack(ones, x_constant), keep_x, warn
+        out = np.empty(
+            (n, x_constant.shape[1] + 1),
+            dtype=np.result_type(np.float64, x_constant.dtype),
+        )
+        out[:, 0] = 1.0
+        out[:, 1:] = x_constant
+        return out, keep_x, warn
     else:
         return x_constant, keep_x, warn
 